@@ -0,0 +1,329 @@
+"""
+Check that the change log is applied the same way however state was built, and that compaction
+never loses changes
+
+Runs against a scratch copy of src/db/data, so the real data is never touched. Exits with an error
+on the first mismatch
+
+usage: PYTHONPATH=src uv run python ./benchmarks/changelog.py
+"""
+
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+from collections import Counter
+from copy import deepcopy
+from time import perf_counter
+
+import click
+
+from app import App
+from db import Database
+from db.changelog import Change, ChangeOperation, StaleChangeLogError
+from models import AppointmentCategory
+
+DATA_DIR = "./src/db/data"
+
+
+def random_changes(rng: random.Random, db: Database, count: int) -> list[Change]:
+    """
+    Build random inserts, updates and deletes of available slots and appointments, including
+    appointments moving between patients/clinicians and rows with duplicate ids
+    """
+    slot_ids = [row["id"] for row in db.available_slots.get()]
+    appointments = db.appointments.get()
+    duplicate_ids = [
+        id
+        for id, count in Counter(row["id"] for row in appointments).items()
+        if count > 1
+    ]
+    patient_ids = [row["id"] for row in db.patients.get()]
+    clinician_ids = [row["id"] for row in db.clinicians.get()]
+
+    changes = []
+    for _ in range(count):
+        operation = rng.choice(list(ChangeOperation))
+        if rng.random() < 0.5:
+            row = {"id": rng.choice([*slot_ids, f"new-slot-{rng.randrange(50)}"])}
+            if operation != ChangeOperation.DELETE:
+                row["date"] = (
+                    f"2024-08-{rng.randint(19, 30)}T{rng.randint(8, 17):02d}:"
+                    f"{rng.choice(['00', '30'])}:00Z"
+                )
+                row["length"] = 90
+            changes.append(Change("available_slots", operation, row))
+        else:
+            # ids that appear more than once only ever have their first row changed: make sure
+            # they come up often enough to check that
+            row = {
+                "id": rng.choice(
+                    duplicate_ids
+                    if duplicate_ids and rng.random() < 0.1
+                    else [
+                        *(row["id"] for row in appointments),
+                        f"new-appt-{rng.randrange(50)}",
+                    ]
+                )
+            }
+            if operation != ChangeOperation.DELETE:
+                row = {
+                    **rng.choice(appointments),
+                    **row,
+                    "patientId": rng.choice(patient_ids),
+                    "clinicianId": rng.choice(clinician_ids),
+                }
+            changes.append(Change("appointments", operation, row))
+
+    return changes
+
+
+def reference_apply(rows: list[dict], change: Change):
+    """
+    Apply a change the simplest possible way: scan for the first row with the changed id
+    """
+    position = next((i for i, row in enumerate(rows) if row["id"] == change.id), None)
+    if change.operation == ChangeOperation.DELETE:
+        if position is not None:
+            del rows[position]
+    elif position is None:
+        rows.append(change.row)
+    else:
+        rows[position] = change.row
+
+
+def load_everything(app: App):
+    """
+    Load every patient and clinician, and fill the filtered availability cache
+    """
+    for row in app.db.patients.get():
+        app.get_patient(row["id"])
+    app.clinician_controller.get_clinicians()
+    availability(app)
+
+
+def availability(app: App) -> dict:
+    """
+    Every patient's availability for every appointment category, as json records
+    """
+    return {
+        (patient_id, category): [
+            response.to_record(str)
+            for response in app.get_available_slots(patient_id, category)
+        ]
+        for patient_id in list(app.patients)
+        for category in AppointmentCategory
+    }
+
+
+def loaded_state(app: App) -> dict:
+    """
+    Loaded clinicians and patients, with appointments compared regardless of order: an appointment
+    moved to another clinician is added to the end of their list, not at its position in the table
+    """
+
+    def dump(models):
+        return [
+            model.model_dump(exclude={"created_at", "updated_at"}) for model in models
+        ]
+
+    return {
+        "clinicians": {
+            clinician.id: (
+                dump(clinician.available_slots),
+                sorted(map(repr, dump(clinician.appointments))),
+            )
+            for clinician in app.clinician_controller.get_clinicians()
+        },
+        "patients": {
+            patient.id: sorted(map(repr, dump(patient.appointments)))
+            for patient in app.patients.values()
+        },
+    }
+
+
+def expect(condition: bool, message: str):
+    if not condition:
+        raise click.ClickException(f"FAILED: {message}")
+
+
+def check_replay(rng: random.Random, changes: int, rounds: int):
+    """
+    Apply rounds of random changes to an already loaded app, comparing it with a reference replay
+    of the tables and with an app loaded from scratch
+
+    Tables are also compared with the reference after every single change, as later changes can
+    hide a wrong one, e.g. by replacing the row it left behind
+    """
+    incremental = App(snapshot_path=None)
+    load_everything(incremental)
+
+    tables = Database.init()
+    reference = {
+        name: deepcopy(tables.tables[name].get())
+        for name in ("appointments", "available_slots")
+    }
+
+    for round in range(rounds):
+        batch = [
+            change.validated()
+            for change in random_changes(rng, incremental.db, changes)
+        ]
+        for number, change in enumerate(batch):
+            incremental.db.changelog.append(change)
+            tables.tables[change.table].apply(change)
+            reference_apply(reference[change.table], change)
+            expect(
+                tables.tables[change.table].get() == reference[change.table],
+                f"{change.table} table after change {number} of round {round}: {change}",
+            )
+
+        start = perf_counter()
+        incremental.refresh()
+        elapsed = perf_counter() - start
+
+        for name, rows in reference.items():
+            expect(
+                incremental.db.tables[name].get() == rows,
+                f"{name} table, round {round}",
+            )
+
+        cold = App(snapshot_path=None)
+        load_everything(cold)
+        expect(
+            loaded_state(incremental) == loaded_state(cold),
+            f"loaded models, round {round}",
+        )
+        expect(
+            availability(incremental) == availability(cold),
+            f"availability, round {round}",
+        )
+        click.echo(
+            f"replay     round {round}: {changes} changes applied in {elapsed * 1000:.1f} ms"
+        )
+
+
+def check_warm_start(rng: random.Random, changes: int, snapshot_path: str):
+    """
+    Start from a snapshot taken partway through the log, and compare with an app loaded from
+    scratch, both before and after more changes arrive
+    """
+    app = App(snapshot_path=snapshot_path)
+    app.save_snapshot()
+
+    warm = App(snapshot_path=snapshot_path)
+    expect(warm.db.available_slots._rows is None, "the log prefix was replayed eagerly")
+
+    for change in random_changes(rng, Database.init(), changes):
+        warm.db.changelog.append(change)
+
+    cold = App(snapshot_path=None)
+    for other in (warm, cold):
+        load_everything(other)
+    expect(availability(warm) == availability(cold), "warm start availability")
+    for name in ("appointments", "available_slots"):
+        expect(
+            warm.db.tables[name].get() == cold.db.tables[name].get(),
+            f"warm {name} table",
+        )
+    click.echo("warm start matches a cold load")
+
+
+def append_inserts(tag: str, count: int):
+    changelog = Database.init().changelog
+    for i in range(count):
+        changelog.append(
+            Change(
+                "available_slots",
+                ChangeOperation.INSERT,
+                {"id": f"{tag}-{i}", "date": "2024-08-26T15:00:00Z", "length": 90},
+            )
+        )
+
+
+def slot_ids() -> set[str]:
+    with open(f"{DATA_DIR}/slots.json") as data:
+        return {row["id"] for row in json.load(data) if "id" in row}
+
+
+def check_compaction(appends: int):
+    """
+    Compact while other processes append, and while another compaction is in flight, then check
+    nothing was lost
+    """
+    before = App(snapshot_path=None)
+    load_everything(before)
+    expected = availability(before)
+
+    Database.init().compact()
+    after = App(snapshot_path=None)
+    load_everything(after)
+    expect(availability(after) == expected, "availability changed by compaction")
+
+    appenders = [
+        multiprocessing.Process(target=append_inserts, args=(tag, appends))
+        for tag in "ab"
+    ]
+    for appender in appenders:
+        appender.start()
+    compactions = 0
+    while any(appender.is_alive() for appender in appenders):
+        Database.init().compact()
+        compactions += 1
+    for appender in appenders:
+        appender.join()
+    Database.init().compact()
+
+    missing = {f"{tag}-{i}" for tag in "ab" for i in range(appends)} - slot_ids()
+    expect(not missing, f"{len(missing)} appended slots lost by compaction")
+    click.echo(
+        f"compaction kept all {2 * appends} concurrent appends over {compactions} runs"
+    )
+
+    # a compactor that read the tables before another compaction rewrote them must not save them
+    stale = Database.init()
+    stale.available_slots.get()
+    append_inserts("c", 1)
+    Database.init().compact()
+    append_inserts("d", 1)
+    try:
+        stale.compact()
+        expect(
+            False, "a compaction saved tables that were rewritten since they were read"
+        )
+    except StaleChangeLogError:
+        pass
+    Database.init().compact()
+    expect({"c-0", "d-0"} <= slot_ids(), "changes lost by overlapping compactions")
+    click.echo("overlapping compactions kept every change")
+
+
+@click.command()
+@click.option("--changes", default=500, show_default=True, help="Changes per round")
+@click.option("--rounds", default=3, show_default=True)
+@click.option("--appends", default=200, show_default=True, help="Appends per writer")
+@click.option("--seed", default=0, show_default=True)
+def main(changes: int, rounds: int, appends: int, seed: int):
+    rng = random.Random(seed)
+    source = os.path.abspath(DATA_DIR)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        shutil.copytree(
+            source,
+            os.path.join(workdir, DATA_DIR),
+            ignore=shutil.ignore_patterns("snapshot.bin", "changes.jsonl*"),
+        )
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            check_replay(rng, changes, rounds)
+            check_warm_start(rng, changes, f"{DATA_DIR}/snapshot.bin")
+            check_compaction(appends)
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Compare slot selection strategies on large synthetic clinician calendars
+
+usage: PYTHONPATH=src uv run python ./benchmarks/slot_selection.py
+"""
+
+import random
+from datetime import datetime, timedelta
+from time import perf_counter
+
+import click
+
+from controllers.slot_selection import MaxBookableSlotSelector, SlotSelection
+from models import (
+    Appointment,
+    AppointmentStatus,
+    AppointmentType,
+    AvailableSlot,
+    Clinician,
+    ClinicianType,
+    InsurancePayer,
+)
+from models.us_states import UsState
+
+START = datetime(2024, 8, 19, 8, 0)
+
+
+def build_clinician(rng: random.Random, weeks: int) -> Clinician:
+    """
+    Build a clinician with [weeks] of availability in 15 minute increments during working
+    hours, with a handful of appointments already booked
+    """
+    slot_dates = [
+        START + timedelta(days=day, minutes=15 * increment)
+        for day in range(weeks * 7)
+        for increment in range(4 * 10)
+        if rng.random() < 0.6
+    ]
+    appointment_dates = rng.sample(slot_dates, k=len(slot_dates) // 100)
+
+    return Clinician(
+        first_name="Synthetic",
+        last_name="Clinician",
+        states=[UsState.NY],
+        insurances=[InsurancePayer.AETNA],
+        clinician_type=ClinicianType.PSYCHOLOGIST,
+        max_daily_appointments=rng.randint(2, 5),
+        max_weekly_appointments=rng.randint(6, 15),
+        available_slots=[AvailableSlot(date=date, length=90) for date in slot_dates],
+        appointments=[
+            Appointment(
+                patient_id="synthetic-patient",
+                clinician_id="synthetic-clinician",
+                scheduled_for=date,
+                appointment_type=AppointmentType.ASSESSMENT_SESSION_1,
+                status=AppointmentStatus.UPCOMING,
+            )
+            for date in appointment_dates
+        ],
+    )
+
+
+@click.command()
+@click.option("--clinicians", default=50, show_default=True)
+@click.option("--weeks", default=52, show_default=True)
+@click.option("--duration", default=90, show_default=True)
+@click.option("--seed", default=0, show_default=True)
+def main(clinicians: int, weeks: int, duration: int, seed: int):
+    rng = random.Random(seed)
+    calendar = [build_clinician(rng, weeks) for _ in range(clinicians)]
+    total_slots = sum(len(clinician.available_slots) for clinician in calendar)
+    click.echo(f"{clinicians} clinicians, {total_slots} slots, {duration} minutes")
+
+    # "bookable" counts how many of the offered slots could actually be booked together
+    # without exceeding any clinician's daily/weekly limits
+    bookable_selector = MaxBookableSlotSelector()
+
+    for selection in SlotSelection:
+        selector = selection.selector
+
+        start = perf_counter()
+        selected = [selector.select(clinician, duration) for clinician in calendar]
+        elapsed = perf_counter() - start
+
+        bookable = sum(
+            len(
+                bookable_selector.select(
+                    clinician.model_copy(update={"available_slots": slots}), duration
+                )
+            )
+            for clinician, slots in zip(calendar, selected)
+        )
+        offered = sum(len(slots) for slots in selected)
+        click.echo(
+            f"{selection.name:<14} {elapsed * 1000:8.1f} ms  offered={offered:<8} bookable={bookable}"
+        )
+
+
+if __name__ == "__main__":
+    main()
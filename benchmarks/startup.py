@@ -0,0 +1,93 @@
+"""
+Measure CLI startup cost using `python -X importtime`
+
+usage: uv run python ./benchmarks/startup.py
+"""
+
+import statistics
+import subprocess
+import sys
+from time import perf_counter
+
+import click
+
+MAIN = "./src/main.py"
+
+GET_OPEN_SLOTS = [
+    "get-open-slots",
+    "--patient-name",
+    "Alexander Garcia",
+    "--appointment-type",
+    "ASSESSMENT",
+]
+
+SCENARIOS = {
+    "--help": ["--help"],
+    "get-open-slots --help": ["get-open-slots", "--help"],
+    "get-open-slots (cold)": ["--no-snapshot", *GET_OPEN_SLOTS],
+    "get-open-slots (warm)": GET_OPEN_SLOTS,
+}
+
+
+def parse_importtime(stderr: str) -> dict[str, int]:
+    """
+    Map each imported module to its cumulative import time, in microseconds
+
+    Nested imports are included, so only top level modules (the ones without indentation) should
+    be summed
+    """
+    import_times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+
+        _, cumulative, module = line.removeprefix("import time:").split("|")
+        import_times[module.rstrip()] = int(cumulative)
+
+    return import_times
+
+
+def run(args: list[str]) -> tuple[float, dict[str, int]]:
+    """
+    Run the CLI once, returning its wall time in seconds and import times
+    """
+    start = perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", MAIN, *args],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return perf_counter() - start, parse_importtime(result.stderr)
+
+
+@click.command()
+@click.option("--runs", default=10, show_default=True)
+@click.option("--top", default=5, show_default=True, help="Slowest imports to list")
+def main(runs: int, top: int):
+    # warm the snapshot + filesystem caches so every scenario starts from the same place
+    run(GET_OPEN_SLOTS)
+
+    for name, args in SCENARIOS.items():
+        results = [run(args) for _ in range(runs)]
+        wall_time = statistics.median(elapsed for elapsed, _ in results)
+        # nested imports are indented under the module that imported them
+        top_level = {
+            module: statistics.median(times[module] for _, times in results)
+            for module in results[0][1]
+            if not module.startswith("  ")
+        }
+        imports_pydantic = any(module.strip() == "pydantic" for module in results[0][1])
+
+        click.echo(
+            f"{name:<24} wall={wall_time * 1000:7.1f} ms  "
+            f"imports={sum(top_level.values()) / 1000:7.1f} ms  "
+            f"pydantic={'yes' if imports_pydantic else 'no'}"
+        )
+        slowest = sorted(top_level.items(), key=lambda item: item[1], reverse=True)
+        for module, cumulative in slowest[:top]:
+            click.echo(f"    {cumulative / 1000:7.1f} ms  {module.strip()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+from collections.abc import Iterable
+from heapq import merge
+
+import click
+
+from controllers.clinician_controller import ClinicianController
+from controllers.slot_selection import SlotSelection
+from db import DEFAULT_SNAPSHOT_PATH, Database
+from db.changelog import (
+    Change,
+    ChangeOperation,
+    IndexedGroups,
+    StaleChangeLogError,
+)
+from db.snapshot import Snapshot
+from models import Appointment, AppointmentCategory, AvailabilityResponse, Patient
+
+
+class App:
+    def __init__(
+        self,
+        slot_selection: SlotSelection = SlotSelection.GREEDY,
+        snapshot_path: str | None = DEFAULT_SNAPSHOT_PATH,
+    ):
+        self.slot_selection = slot_selection
+        self.snapshot = Snapshot(snapshot_path) if snapshot_path else None
+        self.load()
+
+    def load(self):
+        """
+        Load all application state from scratch
+        """
+        self.db = Database.init()
+        self.clinician_controller = ClinicianController(
+            self.db, slot_selector=self.slot_selection.selector
+        )
+        self.patients: dict[str, Patient] = {}
+        self._reported_rejections = 0
+        # loaded patients' appointments, indexed on the first change applied to them
+        self._patient_appointments: IndexedGroups[Appointment] | None = None
+
+        # Restore previously built patients/clinicians/availability if the source data hasn't
+        # changed since the snapshot was written. Otherwise, build it all up front so it can be
+        # snapshotted for the next run
+        self._snapshot_key: tuple[int, int] | None = None
+        snapshot = self.snapshot.load(self.db) if self.snapshot else None
+        # hashes of the source files the in-memory state was built from
+        self._source_hashes, state = snapshot if snapshot else (None, None)
+        if state is not None:
+            try:
+                # The snapshot already includes the start of the change log: skip past it, only
+                # replaying it into tables that are ever read
+                self.db.skip_changes(
+                    state["changelog_offset"], state["changelog_inode"]
+                )
+            except StaleChangeLogError:
+                self._source_hashes, state = None, None
+
+        if state is not None:
+            self.patients = state["patients"]
+            self.clinician_controller.clinicians = state["clinicians"]
+            self.clinician_controller.filtered_slots = state["filtered_slots"]
+            self._snapshot_key = self._get_snapshot_key()
+            self.refresh()
+        else:
+            self.db.apply_changes()
+            self._report_rejected_changes()
+            if self.snapshot:
+                self.patients = {
+                    patient.id: patient for patient in Patient.load_all(self.db)
+                }
+                self.clinician_controller.get_clinicians()
+                self._source_hashes = self.db.source_hashes
+
+    def refresh(self):
+        """
+        Apply any changes appended to the database's change log since the last refresh, without
+        reloading everything else
+        """
+        try:
+            changes = self.db.apply_changes()
+        except StaleChangeLogError:
+            # the change log was compacted into the tables' source files: start over from them
+            self.load()
+            return
+
+        self._report_rejected_changes()
+        self.clinician_controller.apply_changes(changes)
+        self._apply_patient_appointment_changes(
+            [change for change in changes if change.table == "appointments"]
+        )
+
+    def _report_rejected_changes(self):
+        """
+        Warn about change log lines that were skipped, since the last report, because they
+        couldn't be applied
+        """
+        changelog = self.db.changelog
+        if changelog is None:
+            return
+
+        for rejected in changelog.rejected[self._reported_rejections :]:
+            click.echo(
+                f"Skipped the change at byte {rejected.offset} of {changelog.path}: {rejected.error}. "
+                f"Run compact-changes to move it to {changelog.rejected_path}",
+                err=True,
+            )
+        self._reported_rejections = len(changelog.rejected)
+
+    def _apply_patient_appointment_changes(self, changes: list[Change]):
+        """
+        Update the loaded patients' appointments to match changes to the appointments table
+        """
+        if not changes:
+            return
+
+        if self._patient_appointments is None:
+            self._patient_appointments = IndexedGroups()
+            for patient in self.patients.values():
+                self._patient_appointments.add(patient.id, patient.appointments)
+
+        for change in changes:
+            appointment = (
+                None
+                if change.operation == ChangeOperation.DELETE
+                else Appointment.model_validate(change.row)
+            )
+            self._patient_appointments.apply(
+                change, appointment, [appointment.patient_id] if appointment else []
+            )
+
+        self._patient_appointments.flush()
+
+    def _get_snapshot_key(self) -> tuple[int, int]:
+        """
+        Cheap fingerprint of the state that would be written to the snapshot
+        """
+        changelog_offset = self.db.changelog.offset if self.db.changelog else 0
+        return changelog_offset, len(self.clinician_controller.filtered_slots)
+
+    def save_snapshot(self):
+        """
+        Write the current state to the snapshot, if it has changed since the snapshot was loaded
+        """
+        snapshot_key = self._get_snapshot_key()
+        if (
+            not self.snapshot
+            or self._source_hashes is None
+            or self._snapshot_key == snapshot_key
+        ):
+            return
+
+        # if the source files changed while we were running, the state no longer matches them and
+        # isn't saved: the next run will rebuild it from the new files instead
+        saved = self.snapshot.save(
+            self.db,
+            {
+                "patients": self.patients,
+                "clinicians": self.clinician_controller.get_clinicians(),
+                "filtered_slots": self.clinician_controller.filtered_slots,
+                "changelog_offset": snapshot_key[0],
+                "changelog_inode": self.db.changelog.inode
+                if self.db.changelog
+                else None,
+            },
+            self._source_hashes,
+        )
+        if saved:
+            self._snapshot_key = snapshot_key
+
+    def get_patient(self, patient_id: str) -> Patient:
+        """
+        Get a patient, only loading them from the database the first time
+        """
+        if patient_id not in self.patients:
+            patient = self.patients[patient_id] = Patient.load(self.db, patient_id)
+            if self._patient_appointments is not None:
+                self._patient_appointments.add(patient.id, patient.appointments)
+
+        return self.patients[patient_id]
+
+    def get_available_slots(
+        self,
+        patient_id: str,
+        appointment_category: AppointmentCategory,
+        limit: int | None = None,
+    ) -> Iterable[AvailabilityResponse]:
+        """
+        Get all open appointment slots that a Patient can book for a given "type" of appointment
+
+        If `limit` is given, only return that many of the earliest slots (or slot + follow up pairs).
+        Otherwise, the slots are produced lazily as they are iterated over
+
+        ASSUMPTION: patient must provide the type of appointment they are looking for when
+                    searching for clinician availability
+        """
+
+        self.refresh()
+
+        # First, load only clinicians that accept the patient's insurance/state,
+        # and who are the correct "type" to handle this category of appointment
+        patient = self.get_patient(patient_id)
+        compatible_clinians = self.clinician_controller.get_compatible_clinicians(
+            patient, appointment_category
+        )
+        if not compatible_clinians:
+            click.echo(
+                f"No clinicians supporting {appointment_category.value} appointments found in {patient.state.value} that accept {patient.insurance.value}",
+                err=True,
+            )
+            return []
+
+        # Limit each clinician's availability so that
+        # 1. only non-overlapping slots are shown
+        # 2. availability is only shown if the clinician is not already "full" for that day/week
+        # Clinicians are shared with the controller's cache, so work on copies of them
+        duration = 90 if appointment_category == AppointmentCategory.ASSESSMENT else 60
+        compatible_clinians = [
+            clinician.model_copy(
+                update={
+                    "available_slots": self.clinician_controller.filter_availability_slots(
+                        clinician, duration
+                    )
+                }
+            )
+            for clinician in compatible_clinians
+        ]
+
+        # Looking for only the first few options: avoid building every possible combination of
+        # initial + follow up slots just to throw most of them away
+        if limit is not None:
+            return self.clinician_controller.get_earliest_availability(
+                compatible_clinians,
+                limit,
+                with_follow_up=appointment_category == AppointmentCategory.ASSESSMENT,
+            )
+
+        # For patients looking to book an initial assessment, they must also book the follow up
+        # assessment at the same time
+        # For each clinician, map from their initial availability to all eligible follow up slots
+        # example:
+        # {
+        #   "clinician-1-id": {"2025-05-04 @ 12:00": ["2025-05-05 @ 12:00", "2025-05-05 @ 13:30"]}
+        #   "clinician-2-id": {"2025-05-04 @ 12:00": ["2025-05-05 @ 12:00", "2025-05-05 @ 13:30"]}
+        # }
+        clinician_follow_up_appointments = {}
+        if appointment_category == AppointmentCategory.ASSESSMENT:
+            for clinician in compatible_clinians:
+                clinician_follow_up_appointments[clinician.id] = (
+                    self.clinician_controller.get_follow_up_appointments(clinician)
+                )
+
+        # Map clinicians with their availability to a user-friendly response model, excluding private clinician information like
+        # maxDailyAppointments/maxWeeklyAppointments
+        clinician_availability = [
+            AvailabilityResponse.from_clinician(
+                clinician,
+                follow_up_slots=clinician_follow_up_appointments.get(clinician.id),
+            )
+            for clinician in compatible_clinians
+        ]
+
+        # Return all clinician availability in chronological order, grouped by clinician. Each
+        # clinician's availability is already in order, so merge it as it's produced rather than
+        # building and sorting everything up front
+        return merge(*clinician_availability, key=lambda rsp: rsp.sort_fields)
@@ -1,11 +1,29 @@
-from collections import Counter
-from dataclasses import dataclass
-from datetime import timedelta
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from heapq import heappush, heapreplace
 
+from controllers.slot_selection import GreedySlotSelector, SlotSelector
 from db import Database
+from db.changelog import Change, ChangeOperation, IndexedGroups
+from models.appointment import Appointment
 from models.clinician import AvailableSlot, Clinician
 from models.patient import Patient
 from models.requests import AppointmentCategory
+from models.responses import AvailabilityResponse
+
+
+@dataclass
+class _Candidate:
+    """
+    Heap entry ordered in reverse, so `heapq` keeps the *worst* candidate on top
+    """
+
+    key: tuple
+    response: AvailabilityResponse
+
+    def __lt__(self, other: "_Candidate") -> bool:
+        return self.key > other.key
 
 
 @dataclass
@@ -16,13 +34,89 @@ class ClinicianController:
 
     conn: Database
 
+    slot_selector: SlotSelector = field(default_factory=GreedySlotSelector)
+    """Strategy used to decide which available slots are offered to patients"""
+
+    clinicians: list[Clinician] | None = None
+    """Every clinician in the database, loaded on first use"""
+
+    filtered_slots: dict[tuple[str, str, int], list[AvailableSlot]] = field(
+        default_factory=dict
+    )
+    """Filtered availability, keyed by (slot selector, clinician id, appointment duration)"""
+
+    _slots: IndexedGroups[AvailableSlot] | None = field(
+        default=None, init=False, repr=False
+    )
+    """Loaded clinicians' available slots, indexed on the first change applied to them"""
+
+    _appointments: IndexedGroups[Appointment] | None = field(
+        default=None, init=False, repr=False
+    )
+    """Loaded clinicians' appointments, indexed on the first change applied to them"""
+
+    def get_clinicians(self) -> list[Clinician]:
+        """
+        Get all clinicians, only loading them from the database the first time
+        """
+        if self.clinicians is None:
+            self.clinicians = Clinician.load_all(self.conn)
+
+        return self.clinicians
+
+    def apply_changes(self, changes: list[Change]):
+        """
+        Update the loaded clinicians, and their filtered availability, to match changes that were
+        applied to the database
+        """
+        # nothing has been loaded from the (already changed) tables yet
+        if self.clinicians is None or not changes:
+            return
+
+        if self._slots is None or self._appointments is None:
+            self._slots, self._appointments = IndexedGroups(), IndexedGroups()
+            for clinician in self.clinicians:
+                self._slots.add(clinician.id, clinician.available_slots)
+                self._appointments.add(clinician.id, clinician.appointments)
+
+        clinician_ids = [clinician.id for clinician in self.clinicians]
+        changed_clinicians: set[str] = set()
+        for change in changes:
+            deleted = change.operation == ChangeOperation.DELETE
+            match change.table:
+                case "available_slots":
+                    # ASSUMPTION: all clinicians share the same availability
+                    #             (see AvailableSlot.load_all)
+                    slot = None if deleted else AvailableSlot.model_validate(change.row)
+                    changed_clinicians |= self._slots.apply(change, slot, clinician_ids)
+
+                case "appointments":
+                    # the appointment may have moved between clinicians: it is dropped from everyone
+                    # else, and only kept by the clinician it now belongs to
+                    appointment = (
+                        None if deleted else Appointment.model_validate(change.row)
+                    )
+                    changed_clinicians |= self._appointments.apply(
+                        change,
+                        appointment,
+                        [appointment.clinician_id] if appointment else [],
+                    )
+
+        self._slots.flush()
+        self._appointments.flush()
+        self.filtered_slots = {
+            key: slots
+            for key, slots in self.filtered_slots.items()
+            if key[1] not in changed_clinicians
+        }
+
     def get_compatible_clinicians(
         self, patient: Patient, appointment_category: AppointmentCategory
     ) -> list[Clinician]:
         """
         Get all clinicians who can take an appointment with the given patient
         """
-        clinicians = Clinician.load_all(self.conn)
+        clinicians = self.get_clinicians()
         clinicians_for_appointment_type = [
             clinician
             for clinician in clinicians
@@ -41,39 +135,17 @@ class ClinicianController:
         """
         Filter the clinician's available_slots to maximize the number of [duration] minute
         appointments, taking into account their max availability + scheduled appointments
-        """
-        appointment_counter = Counter(
-            [appointment.scheduled_for.date() for appointment in clinician.appointments]
-        )
 
-        duration_span = timedelta(minutes=duration)
-
-        filtered_slots: list[AvailableSlot] = []
-
-        for slot in sorted(clinician.available_slots, key=lambda slot: slot.date):
-            # slot is too close to the previous one: filter it out
-            if filtered_slots and slot.date < (filtered_slots[-1].date + duration_span):
-                continue
-
-            slot_date = slot.date.date()
-
-            # check commitments for the current date - ignore any available slots if we're over
-            # the clinician's limit
-            if appointment_counter[slot_date] >= clinician.max_daily_appointments:
-                continue
-
-            # check commitments over the past week
-            appointments_for_week = 0
-            for i in range(7):
-                date = slot_date - timedelta(days=i)
-                appointments_for_week += appointment_counter[date]
-
-            if appointments_for_week >= clinician.max_weekly_appointments:
-                continue
-
-            filtered_slots.append(slot)
+        The actual selection is delegated to this controller's `slot_selector`, and cached
+        per clinician. The cache is only kept up to date by `apply_changes`, which drops the entries
+        of every clinician whose available slots or appointments it changed: anything else that
+        modifies a loaded clinician must do the same
+        """
+        key = (type(self.slot_selector).__name__, clinician.id, duration)
+        if key not in self.filtered_slots:
+            self.filtered_slots[key] = self.slot_selector.select(clinician, duration)
 
-        return filtered_slots
+        return self.filtered_slots[key]
 
     def get_follow_up_appointments(
         self,
@@ -88,9 +160,7 @@ class ClinicianController:
         availability_follow_up_map: dict[str, list[AvailableSlot]] = {}
 
         for slot in clinician.available_slots:
-            slot_date = slot.date.date()
-            next_day = slot_date + timedelta(days=1)
-            next_week = slot_date + timedelta(days=7)
+            next_day, next_week = self.get_follow_up_window(slot)
 
             availability_follow_up_map[slot.id] = [
                 availability
@@ -99,3 +169,88 @@ class ClinicianController:
             ]
 
         return availability_follow_up_map
+
+    @staticmethod
+    def get_follow_up_window(slot: AvailableSlot) -> tuple[date, date]:
+        """
+        First and last days (inclusive) on which a follow up to the given slot can be scheduled
+        """
+        slot_date = slot.date.date()
+        return slot_date + timedelta(days=1), slot_date + timedelta(days=7)
+
+    def get_earliest_availability(
+        self,
+        clinicians: list[Clinician],
+        limit: int,
+        with_follow_up: bool,
+    ) -> list[AvailabilityResponse]:
+        """
+        Get the [limit] earliest available slots across all of the given clinicians, each paired
+        with a follow up slot if `with_follow_up`
+
+        Results are ordered by initial slot, then follow up slot, then clinician. Only the best
+        [limit] candidates are ever kept, and each clinician's slots are only scanned until they
+        can no longer beat the current [limit]-th best candidate
+        """
+        # heap of the best candidates found so far, with the worst of them on top
+        best: list[_Candidate] = []
+
+        def can_beat_worst(key: tuple) -> bool:
+            return len(best) < limit or key < best[0].key
+
+        # visit clinicians with the earliest availability first, so the bound tightens quickly
+        clinicians_by_availability = sorted(
+            (clinician for clinician in clinicians if clinician.available_slots),
+            key=lambda clinician: min(slot.date for slot in clinician.available_slots),
+        )
+        for clinician in clinicians_by_availability:
+            slots = sorted(clinician.available_slots, key=lambda slot: slot.date)
+            slot_days = [slot.date.date() for slot in slots]
+            clinician_key = (clinician.last_name, clinician.first_name, clinician.id)
+
+            for slot in slots:
+                # every later slot for this clinician starts later still
+                if not can_beat_worst((slot.date,)):
+                    break
+
+                if with_follow_up:
+                    next_day, next_week = self.get_follow_up_window(slot)
+                    follow_up_slots = (
+                        slots[i]
+                        for i in range(
+                            bisect_left(slot_days, next_day),
+                            bisect_right(slot_days, next_week),
+                        )
+                    )
+                else:
+                    follow_up_slots = iter([None])
+
+                for follow_up_slot in follow_up_slots:
+                    key = (
+                        slot.date,
+                        follow_up_slot.date if follow_up_slot else slot.date,
+                        *clinician_key,
+                    )
+                    # every later follow up for this slot is later still
+                    if not can_beat_worst(key):
+                        break
+
+                    candidate = _Candidate(
+                        key,
+                        AvailabilityResponse(
+                            clinician_first_name=clinician.first_name,
+                            clinician_last_name=clinician.last_name,
+                            clinician_id=clinician.id,
+                            slot=slot,
+                            follow_up_slot=follow_up_slot,
+                        ),
+                    )
+                    if len(best) < limit:
+                        heappush(best, candidate)
+                    else:
+                        heapreplace(best, candidate)
+
+        return [
+            candidate.response
+            for candidate in sorted(best, key=lambda candidate: candidate.key)
+        ]
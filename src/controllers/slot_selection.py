@@ -0,0 +1,153 @@
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date, timedelta
+from enum import Enum
+from typing import TYPE_CHECKING, Protocol
+
+if TYPE_CHECKING:
+    from models.clinician import AvailableSlot, Clinician
+
+DAYS_PER_WEEK = 7
+
+
+class SlotSelector(Protocol):
+    """
+    Strategy used to pick which of a clinician's available slots are offered to patients
+    """
+
+    def select(
+        self, clinician: "Clinician", duration: int
+    ) -> list["AvailableSlot"]: ...
+
+
+def _appointment_counter(clinician: "Clinician") -> Counter[date]:
+    """
+    Count the clinician's booked appointments per day
+    """
+    return Counter(
+        [appointment.scheduled_for.date() for appointment in clinician.appointments]
+    )
+
+
+def _trailing_week_count(counter: Counter[date], day: date) -> int:
+    """
+    Total of `counter` over the week ending on (and including) `day`
+    """
+    return sum(counter[day - timedelta(days=i)] for i in range(DAYS_PER_WEEK))
+
+
+@dataclass
+class GreedySlotSelector:
+    """
+    Keep the earliest slot, and drop anything within [duration] minutes of it
+
+    Days/weeks where the clinician is already at their limit of booked appointments are skipped,
+    but the slots that are kept do not count towards those limits
+    """
+
+    def select(self, clinician: "Clinician", duration: int) -> list["AvailableSlot"]:
+        appointment_counter = _appointment_counter(clinician)
+
+        duration_span = timedelta(minutes=duration)
+
+        filtered_slots: list[AvailableSlot] = []
+
+        for slot in sorted(clinician.available_slots, key=lambda slot: slot.date):
+            # slot is too close to the previous one: filter it out
+            if filtered_slots and slot.date < (filtered_slots[-1].date + duration_span):
+                continue
+
+            slot_date = slot.date.date()
+
+            # check commitments for the current date - ignore any available slots if we're over
+            # the clinician's limit
+            if appointment_counter[slot_date] >= clinician.max_daily_appointments:
+                continue
+
+            # check commitments over the past week
+            appointments_for_week = _trailing_week_count(appointment_counter, slot_date)
+
+            if appointments_for_week >= clinician.max_weekly_appointments:
+                continue
+
+            filtered_slots.append(slot)
+
+        return filtered_slots
+
+
+@dataclass
+class MaxBookableSlotSelector:
+    """
+    Pick the largest set of non-overlapping slots that could *all* be booked without pushing the
+    clinician over their daily or weekly limits
+
+    Unlike the greedy selector, every kept slot uses up capacity, so full days stop receiving
+    slots and the remaining weekly capacity is left for later days.
+
+    Slots are scanned in start order (earliest finish, since every slot is [duration] minutes
+    long), keeping a slot when it does not overlap the previous pick and every day/week it falls
+    in still has room. Days and weeks are contiguous ranges of time, so for any optimal selection
+    the k-th pick made here starts no later than its k-th pick, which makes the result maximal.
+    The sort dominates: O(S log S) for S slots.
+    """
+
+    def select(self, clinician: "Clinician", duration: int) -> list["AvailableSlot"]:
+        # Booked + selected appointments per day, and per week keyed by the week's last day
+        day_load = _appointment_counter(clinician)
+        week_load: Counter[date] = Counter()
+        for day, count in day_load.items():
+            self._add_to_weeks(week_load, day, count)
+
+        duration_span = timedelta(minutes=duration)
+
+        selected_slots: list[AvailableSlot] = []
+
+        for slot in sorted(clinician.available_slots, key=lambda slot: slot.date):
+            if selected_slots and slot.date < (selected_slots[-1].date + duration_span):
+                continue
+
+            slot_date = slot.date.date()
+
+            if day_load[slot_date] >= clinician.max_daily_appointments:
+                continue
+
+            # ASSUMPTION: "per week" means any 7 consecutive days, matching the greedy selector's
+            #             trailing-week check. Booking on `slot_date` counts towards the weeks
+            #             ending on each of the following 6 days as well
+            if any(
+                week_load[slot_date + timedelta(days=i)]
+                >= clinician.max_weekly_appointments
+                for i in range(DAYS_PER_WEEK)
+            ):
+                continue
+
+            day_load[slot_date] += 1
+            self._add_to_weeks(week_load, slot_date, 1)
+            selected_slots.append(slot)
+
+        return selected_slots
+
+    @staticmethod
+    def _add_to_weeks(week_load: Counter[date], day: date, count: int):
+        """
+        Count `count` appointments on `day` towards every trailing week containing it
+        """
+        for i in range(DAYS_PER_WEEK):
+            week_load[day + timedelta(days=i)] += count
+
+
+class SlotSelection(Enum):
+    """
+    Available slot selection strategies
+    """
+
+    GREEDY = "GREEDY"
+    MAX_BOOKABLE = "MAX_BOOKABLE"
+
+    @property
+    def selector(self) -> SlotSelector:
+        match self.name:
+            case "GREEDY":
+                return GreedySlotSelector()
+            case "MAX_BOOKABLE":
+                return MaxBookableSlotSelector()
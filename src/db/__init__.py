@@ -1,6 +1,33 @@
-from dataclasses import dataclass
 import json
+import os
+from collections.abc import Callable
+from dataclasses import dataclass, field, fields
+from functools import cache
 from typing import overload
+from uuid import NAMESPACE_URL, uuid5
+
+from db.changelog import (
+    CHANGE_TABLES,
+    Change,
+    ChangeLog,
+    ChangeOperation,
+    IndexedRows,
+    RejectedChange,
+    StaleChangeLogError,
+)
+
+DEFAULT_SNAPSHOT_PATH = "./src/db/data/snapshot.bin"
+"""Where the app's state snapshot is written, alongside the data it was built from"""
+
+
+def hash_source(data: bytes) -> str:
+    """
+    Fingerprint of a table's source file contents
+    """
+    # only needed once a table is actually read: keep it out of `--help`
+    import hashlib
+
+    return hashlib.sha256(data).hexdigest()
 
 
 @dataclass
@@ -11,6 +38,23 @@ class Table:
 
     source: str
 
+    changed: bool = field(default=False, init=False)
+    """Whether changes have been applied since the table was read from `source`"""
+
+    source_hash: str | None = field(default=None, init=False)
+    """Hash of `source` as it was when the table was read from it"""
+
+    _rows: IndexedRows[dict] | None = field(default=None, init=False, repr=False)
+    """Rows read from `source` on first use"""
+
+    _pending: list[Change] = field(default_factory=list, init=False, repr=False)
+    """Changes applied before the rows were read, which are replayed once they are"""
+
+    _skipped: Callable[[], list[Change]] | None = field(
+        default=None, init=False, repr=False
+    )
+    """Reads changes skipped over before the rows were read, which are replayed before `_pending`"""
+
     @overload
     def get(self, id: str) -> dict: ...
 
@@ -24,16 +68,74 @@ class Table:
         If `id` is given, return the row with the corresponding `id` from the table.
         Otherwise, return the entire collection
         """
-        with open(self.source, "r") as data:
-            raw_data = json.load(data)
+        rows = self._load()
 
         if id is None:
-            return raw_data
+            return rows.to_list()
 
-        return next(
-            (row for row in raw_data if "id" in row and row["id"] == id), raw_data[0]
+        row = rows.get(id)
+        return row if row is not None else rows.to_list()[0]
+
+    def apply(self, change: Change):
+        """
+        Apply a change to this table's rows, without re-reading its source file
+        """
+        self.changed = True
+
+        if self._rows is None:
+            self._pending.append(change)
+            return
+
+        self._rows.apply(
+            change.id,
+            None if change.operation == ChangeOperation.DELETE else change.row,
         )
 
+    def save(self):
+        """
+        Write this table's rows, including any applied changes, back to its source file
+        """
+        rows = self._load()
+
+        tmp_source = f"{self.source}.{os.getpid()}.tmp"
+        with open(tmp_source, "w") as data:
+            json.dump(rows.to_list(), data, indent=4)
+        os.replace(tmp_source, self.source)
+
+        self.changed = False
+
+    def is_stale(self) -> bool:
+        """
+        Whether `source` has been rewritten since the table was read from it
+        """
+        if self.source_hash is None:
+            return False
+
+        with open(self.source, "rb") as data:
+            return hash_source(data.read()) != self.source_hash
+
+    def _load(self) -> IndexedRows[dict]:
+        if self._rows is None:
+            with open(self.source, "rb") as data:
+                raw_data = data.read()
+            self.source_hash = hash_source(raw_data)
+            rows = json.loads(raw_data)
+
+            # ASSUMPTION: rows without an id (e.g. available slots) are identified by their position
+            #             in the source file, so that changes can refer to them
+            for index, row in enumerate(rows):
+                row.setdefault(
+                    "id", str(uuid5(NAMESPACE_URL, f"{self.source}#{index}"))
+                )
+            self._rows = IndexedRows(rows, get_id=lambda row: row["id"])
+
+            skipped, self._skipped = self._skipped, None
+            pending, self._pending = self._pending, []
+            for change in (skipped() if skipped else []) + pending:
+                self.apply(change)
+
+        return self._rows
+
 
 @dataclass
 class Database:
@@ -46,6 +148,9 @@ class Database:
     appointments: Table
     available_slots: Table
 
+    changelog: ChangeLog | None = None
+    """Log of changes to apply on top of the tables' source files"""
+
     @classmethod
     def init(cls):
         return cls(
@@ -53,4 +158,105 @@ class Database:
             clinicians=Table(source="./src/db/data/clinicians.json"),
             appointments=Table(source="./src/db/data/appointments.json"),
             available_slots=Table(source="./src/db/data/slots.json"),
+            changelog=ChangeLog(path="./src/db/data/changes.jsonl"),
         )
+
+    @property
+    def tables(self) -> dict[str, Table]:
+        """All tables in the database, by name"""
+        return {
+            table_field.name: getattr(self, table_field.name)
+            for table_field in fields(self)
+            if isinstance(getattr(self, table_field.name), Table)
+        }
+
+    @property
+    def source_hashes(self) -> dict[str, str] | None:
+        """
+        Hash of each table's source file as it was when the table was read, or None if some
+        tables haven't been read yet
+        """
+        source_hashes = {name: table.source_hash for name, table in self.tables.items()}
+        if None in source_hashes.values():
+            return None
+
+        return source_hashes
+
+    def apply_changes(self) -> list[Change]:
+        """
+        Apply every change appended to the change log since the last call
+
+        Returns the applied changes, so anything derived from the tables can be updated to match
+        """
+        if self.changelog is None:
+            return []
+
+        changes = self.changelog.read()
+        for change in changes:
+            self.tables[change.table].apply(change)
+
+        return changes
+
+    def skip_changes(self, offset: int, inode: int | None):
+        """
+        Move past the first `offset` bytes of the change log without reading them, e.g. because
+        state restored from a snapshot already includes them
+
+        The skipped changes are still replayed into each table, but only once it is actually read
+        """
+        if self.changelog is None or not offset:
+            return
+
+        self.changelog.skip(offset, inode)
+        skipped_log = ChangeLog(self.changelog.path, inode=inode)
+
+        @cache
+        def read_skipped() -> list[Change]:
+            try:
+                return skipped_log.read(until=offset)
+            except StaleChangeLogError:
+                # the log was compacted since, so the tables' source files already include it
+                return []
+
+        for name in CHANGE_TABLES:
+            table = self.tables[name]
+            table.changed = True
+            table._skipped = lambda name=name: [
+                change for change in read_skipped() if change.table == name
+            ]
+
+    def compact(self) -> list[RejectedChange]:
+        """
+        Fold the change log into the tables' source files, and drop the folded changes from it
+
+        Changes appended while compacting are kept in the log, to be folded next time. Lines that
+        couldn't be applied are moved to the change log's `rejected_path`, and returned
+
+        Raises StaleChangeLogError, without writing anything, if another process compacted the log
+        after this database read from it
+        """
+        if self.changelog is None:
+            return []
+
+        # held from reading the log until it's truncated, so compactions can't interleave
+        with self.changelog.compacting():
+            # checks the log is still the file any earlier changes were read from
+            self.apply_changes()
+            rejected = self.changelog.rejected
+            changed_tables = [table for table in self.tables.values() if table.changed]
+            if not changed_tables and not rejected:
+                return []
+
+            for table in changed_tables:
+                if table.is_stale():
+                    raise StaleChangeLogError(
+                        f"{table.source} was rewritten since it was read, e.g. by another compaction"
+                    )
+
+            for table in changed_tables:
+                table.save()
+            self.changelog.set_aside(rejected)
+            self.changelog.truncate()
+            self.changelog.rejected = []
+
+        return rejected
@@ -0,0 +1,435 @@
+import fcntl
+import json
+import os
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
+from enum import Enum
+from typing import BinaryIO, Generic, Protocol, Self, TypeVar
+
+CHANGE_TABLES = ("appointments", "available_slots")
+"""Tables that can be changed through the change log"""
+
+
+class ChangeOperation(Enum):
+    INSERT = "INSERT"
+    UPDATE = "UPDATE"
+    DELETE = "DELETE"
+
+
+class InvalidChangeError(ValueError):
+    """
+    A change that can't be applied to the database's tables, e.g. because its row doesn't match the
+    changed table's model
+    """
+
+
+class StaleChangeLogError(Exception):
+    """
+    The change log no longer holds changes that were already read from it, e.g. because another
+    process compacted it into the tables' source files
+    """
+
+
+@dataclass
+class Change:
+    """
+    A single insert, update, or delete of a row in one of the database's tables
+
+    Updates replace the whole row, so they must include every column, not just the changed ones
+    """
+
+    table: str
+    """Name of the changed table, as found on `Database`"""
+
+    operation: ChangeOperation
+    """What happened to the row"""
+
+    row: dict
+    """The row as it is after the change. Deletes only need to include the row's id"""
+
+    @property
+    def id(self) -> str:
+        """Identifier of the changed row"""
+        return self.row["id"]
+
+    @classmethod
+    def from_json(cls, line: str | bytes) -> Self:
+        try:
+            raw = json.loads(line)
+            change = cls(
+                table=raw["table"],
+                operation=ChangeOperation(raw["operation"]),
+                row=raw["row"],
+            )
+        except (ValueError, KeyError, TypeError) as e:
+            raise InvalidChangeError(f"Not a valid change: {e!r}") from e
+
+        return change.validated()
+
+    def validated(self) -> Self:
+        """
+        Check the changed row against its table's model, and return the change with the row in the
+        one form tables store rows in: camelCase field names and json values
+
+        Raises InvalidChangeError if the change can't be applied
+        """
+        if self.table not in CHANGE_TABLES:
+            raise InvalidChangeError(
+                f"Changes to the {self.table} table are not supported"
+            )
+        if not isinstance(self.row, dict) or not isinstance(self.row.get("id"), str):
+            raise InvalidChangeError(
+                f"{self.operation.value} to {self.table} has no row id"
+            )
+
+        if self.operation == ChangeOperation.DELETE:
+            return replace(self, row={"id": self.id})
+
+        # imported on first use, as the models themselves import `db`
+        from pydantic import ValidationError
+
+        from models import Appointment, AvailableSlot
+
+        model = {"appointments": Appointment, "available_slots": AvailableSlot}[
+            self.table
+        ]
+        try:
+            row = model.model_validate(self.row).model_dump(
+                by_alias=True, mode="json", exclude_unset=True
+            )
+        except ValidationError as e:
+            problems = "; ".join(
+                f"{'.'.join(map(str, error['loc']))}: {error['msg']}"
+                for error in e.errors()
+            )
+            raise InvalidChangeError(
+                f"{self.operation.value} to {self.table} row {self.id} is invalid: {problems}"
+            ) from e
+
+        return replace(self, row=row)
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {"table": self.table, "operation": self.operation.value, "row": self.row}
+        )
+
+
+@dataclass
+class RejectedChange:
+    """
+    A line of the change log that was skipped because it couldn't be applied
+    """
+
+    offset: int
+    """Position of the line in the log, in bytes"""
+
+    line: bytes
+    """The line as it was written, including its newline"""
+
+    error: InvalidChangeError
+    """Why the line couldn't be applied"""
+
+
+@dataclass
+class ChangeLog:
+    """
+    Append-only JSON Lines file of changes to the database's tables
+
+    Each line is a json object with the changed `table`, the `operation`, and the changed `row`:
+    {"table": "available_slots", "operation": "INSERT", "row": {"id": "...", "length": 90, ...}}
+    """
+
+    path: str
+
+    offset: int = 0
+    """Number of bytes at the start of the log which have already been read"""
+
+    inode: int | None = None
+    """Inode of the log file when it was last read, used to tell if it has been replaced"""
+
+    rejected: list[RejectedChange] = field(default_factory=list, repr=False)
+    """Lines skipped by every read so far, which are moved aside when the log is compacted"""
+
+    @property
+    def rejected_path(self) -> str:
+        """Where lines that couldn't be applied are moved to when the log is compacted"""
+        return f"{self.path}.rejected"
+
+    def read(self, until: int | None = None) -> list[Change]:
+        """
+        Read the changes written since the last read (stopping `until` bytes into the log, if
+        given), and move `offset` past them
+
+        Lines that can't be applied are skipped, and added to `rejected`
+        """
+        try:
+            with open(self.path, "rb") as log:
+                stat = os.fstat(log.fileno())
+                if (
+                    self.inode is not None and stat.st_ino != self.inode
+                ) or stat.st_size < max(self.offset, until or 0):
+                    raise StaleChangeLogError(
+                        f"{self.path} was replaced since last read"
+                    )
+
+                log.seek(self.offset)
+                data = log.read(-1 if until is None else until - self.offset)
+        except FileNotFoundError:
+            if self.offset or until:
+                raise StaleChangeLogError(f"{self.path} was removed since last read")
+            return []
+
+        # a writer may be partway through appending a change: leave it for the next read
+        complete = data[: data.rfind(b"\n") + 1]
+        line_offset = self.offset
+        self.offset += len(complete)
+        self.inode = stat.st_ino
+
+        # a bad line is skipped rather than raised, so it can't stop every later change (or the
+        # compaction that would move it aside) from being applied
+        changes = []
+        for line in complete.splitlines(keepends=True):
+            if line.strip():
+                try:
+                    changes.append(Change.from_json(line))
+                except InvalidChangeError as e:
+                    self.rejected.append(RejectedChange(line_offset, line, e))
+            line_offset += len(line)
+
+        return changes
+
+    def skip(self, offset: int, inode: int | None):
+        """
+        Move `offset` forward to the given position without reading the changes before it, after
+        checking the log is still the file at `inode` and holds at least that many bytes
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            if offset:
+                raise StaleChangeLogError(f"{self.path} was removed since last read")
+            return
+
+        if (inode is not None and stat.st_ino != inode) or stat.st_size < offset:
+            raise StaleChangeLogError(f"{self.path} was replaced since last read")
+
+        self.offset = offset
+        self.inode = stat.st_ino
+
+    def append(self, change: Change):
+        """
+        Add a change to the end of the log
+
+        Raises InvalidChangeError, without writing anything, if the change can't be applied
+        """
+        change = change.validated()
+        with self._locked() as log:
+            log.write((change.to_json() + "\n").encode())
+
+    def set_aside(self, rejected: list[RejectedChange]):
+        """
+        Append lines that couldn't be applied to `rejected_path`, so they can be fixed and added
+        back to the log by hand
+        """
+        if not rejected:
+            return
+
+        with open(self.rejected_path, "ab") as rejected_log:
+            rejected_log.writelines(change.line for change in rejected)
+
+    def truncate(self):
+        """
+        Drop the changes that have already been read from the log
+
+        Anything appended since the last read is carried over to a new log, which replaces the old
+        one so readers holding an offset into it can tell it changed
+        """
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with self._locked() as log:
+            if self.inode is not None and os.fstat(log.fileno()).st_ino != self.inode:
+                raise StaleChangeLogError(f"{self.path} was replaced since last read")
+
+            log.seek(self.offset)
+            with open(tmp_path, "wb") as new_log:
+                new_log.write(log.read())
+            os.replace(tmp_path, self.path)
+            inode = os.stat(self.path).st_ino
+
+        self.offset = 0
+        self.inode = inode
+
+    @contextmanager
+    def compacting(self) -> Iterator[None]:
+        """
+        Hold the compaction lock, so only one process at a time folds the log into the tables
+
+        Appends don't take this lock: anything they add while it is held is carried over by
+        `truncate`
+        """
+        with open(f"{self.path}.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    @contextmanager
+    def _locked(self) -> Iterator[BinaryIO]:
+        """
+        Open the current log file under an exclusive lock, so appends can't land in it while it is
+        being replaced
+        """
+        while True:
+            with open(self.path, "a+b") as log:
+                fcntl.flock(log, fcntl.LOCK_EX)
+                try:
+                    replaced = (
+                        os.stat(self.path).st_ino != os.fstat(log.fileno()).st_ino
+                    )
+                except FileNotFoundError:
+                    replaced = True
+
+                # if the log was replaced while we waited for the lock, use the new one instead
+                if not replaced:
+                    yield log
+                    return
+
+
+RowT = TypeVar("RowT")
+
+
+class IndexedRows(Generic[RowT]):
+    """
+    Rows kept in their original order and indexed by id, so a change can be applied in O(1)
+
+    ids aren't guaranteed to be unique: changes only ever touch the first row with a matching id
+    """
+
+    def __init__(self, rows: Iterable[RowT], get_id: Callable[[RowT], str]):
+        self._rows: dict[int, RowT] = {}
+        """Rows keyed by when they were added, so removing one doesn't move the others"""
+
+        self._keys_by_id: dict[str, deque[int]] = {}
+        """Keys of the rows with each id, in order"""
+
+        self._next_key = 0
+        self._list: list[RowT] | None = None
+
+        for row in rows:
+            self._append(get_id(row), row)
+
+    def get(self, id: str) -> RowT | None:
+        """
+        Return the first row with the given id, if there is one
+        """
+        keys = self._keys_by_id.get(id)
+        return self._rows[keys[0]] if keys else None
+
+    def apply(self, id: str, row: RowT | None):
+        """
+        Replace the first row with the given id by `row`, or remove it if `row` is None
+
+        If there is no row with that id yet, `row` is added to the end
+        """
+        keys = self._keys_by_id.get(id)
+        if keys and row is not None:
+            self._rows[keys[0]] = row
+        elif keys:
+            del self._rows[keys.popleft()]
+            if not keys:
+                del self._keys_by_id[id]
+        elif row is not None:
+            self._append(id, row)
+        else:
+            return
+
+        self._list = None
+
+    def to_list(self) -> list[RowT]:
+        """
+        Return the rows in order. The list is reused until the next change, so must not be modified
+        """
+        if self._list is None:
+            self._list = list(self._rows.values())
+
+        return self._list
+
+    def _append(self, id: str, row: RowT):
+        self._rows[self._next_key] = row
+        self._keys_by_id.setdefault(id, deque()).append(self._next_key)
+        self._next_key += 1
+
+
+class HasId(Protocol):
+    id: str
+
+
+ModelT = TypeVar("ModelT", bound=HasId)
+
+
+class IndexedGroups(Generic[ModelT]):
+    """
+    Lists of already loaded models grouped by owner (e.g. each clinician's appointments), indexed so
+    a change can be applied to every list holding the changed row without scanning them
+
+    The lists themselves are only updated, in place, by `flush`: apply a batch of changes first
+    """
+
+    def __init__(self):
+        self._groups: dict[str, list[ModelT]] = {}
+        self._indexes: dict[str, IndexedRows[ModelT]] = {}
+
+        self._holders: dict[str, set[str]] = {}
+        """Groups holding a row with each id"""
+
+        self._changed: set[str] = set()
+        """Groups changed since the last flush"""
+
+    def add(self, group: str, models: list[ModelT]):
+        """
+        Start tracking a group's list of models
+        """
+        self._groups[group] = models
+        self._indexes[group] = IndexedRows(models, get_id=lambda model: model.id)
+        for model in models:
+            self._holders.setdefault(model.id, set()).add(group)
+
+    def apply(
+        self, change: Change, model: ModelT | None, groups: Iterable[str] = ()
+    ) -> set[str]:
+        """
+        Apply a change to the tracked lists, and return the groups whose lists changed
+
+        `model` (the changed row, or None if it was deleted) replaces any existing model for the
+        row in each of `groups`' lists, or is added to them. Any other list holding the row (e.g.
+        because an appointment moved between clinicians) has it removed
+        """
+        holders = self._holders.setdefault(change.id, set())
+        targets = (
+            {group for group in groups if group in self._indexes}
+            if model is not None
+            else set()
+        )
+
+        changed = holders | targets
+        for group in changed:
+            index = self._indexes[group]
+            index.apply(change.id, model if group in targets else None)
+            if index.get(change.id) is None:
+                holders.discard(group)
+            else:
+                holders.add(group)
+
+        if not holders:
+            del self._holders[change.id]
+
+        self._changed |= changed
+        return changed
+
+    def flush(self):
+        """
+        Write the changes applied since the last flush back to the tracked lists
+        """
+        for group in self._changed:
+            self._groups[group][:] = self._indexes[group].to_list()
+
+        self._changed.clear()
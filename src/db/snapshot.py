@@ -0,0 +1,94 @@
+import os
+import pickle
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Any
+
+from db import Database, hash_source
+
+SNAPSHOT_FORMAT = "prosper-snapshot"
+
+SNAPSHOT_VERSION = 4
+"""Bump whenever the shape of the snapshotted state changes"""
+
+
+@dataclass
+class Snapshot:
+    """
+    Binary file holding fully built application state, so it can be restored in a single read
+    instead of re-parsing and re-validating every table
+
+    A snapshot is only valid for the exact source files it was built from: the header records a
+    hash of each of the database's tables, and any mismatch with the files on disk is treated as
+    a cache miss
+    """
+
+    path: str
+
+    def load(self, conn: Database) -> tuple[dict[str, str], Any] | None:
+        """
+        Return the hashes of the source files the stored state was built from along with the
+        state itself, or None if the snapshot is missing or stale
+        """
+        try:
+            with open(self.path, "rb") as snapshot:
+                stream = BytesIO(snapshot.read())
+        except FileNotFoundError:
+            return None
+
+        # The snapshot is just a cache: anything we can't read back (truncated file, renamed
+        # classes, ...) should be rebuilt from the source data rather than crash the app
+        try:
+            source_hashes = self.hash_sources(conn)
+            if pickle.load(stream) != self._header(source_hashes):
+                return None
+            return source_hashes, pickle.load(stream)
+        except (
+            EOFError,
+            AttributeError,
+            ImportError,
+            IndexError,
+            TypeError,
+            ValueError,
+            pickle.UnpicklingError,
+        ):
+            return None
+
+    def save(self, conn: Database, state: Any, source_hashes: dict[str, str]) -> bool:
+        """
+        Write `state`, built from source files with the given hashes, to this snapshot
+
+        Nothing is written if the source files have changed on disk since the state was built from
+        them, as the state would be stored under the wrong hashes. Returns whether it was written
+        """
+        if self.hash_sources(conn) != source_hashes:
+            return False
+
+        buffer = BytesIO()
+        pickle.dump(
+            self._header(source_hashes), buffer, protocol=pickle.HIGHEST_PROTOCOL
+        )
+        pickle.dump(state, buffer, protocol=pickle.HIGHEST_PROTOCOL)
+
+        # write to a temporary file first so a concurrent reader never sees a partial snapshot
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as snapshot:
+            snapshot.write(buffer.getvalue())
+        os.replace(tmp_path, self.path)
+        return True
+
+    @staticmethod
+    def hash_sources(conn: Database) -> dict[str, str]:
+        """
+        Hash each of the database's tables' source files as they currently are on disk
+        """
+        source_hashes = {}
+        for name, table in conn.tables.items():
+            with open(table.source, "rb") as data:
+                source_hashes[name] = hash_source(data.read())
+
+        return source_hashes
+
+    @staticmethod
+    def _header(source_hashes: dict[str, str]) -> tuple[str, int, dict[str, str]]:
+        return SNAPSHOT_FORMAT, SNAPSHOT_VERSION, source_hashes
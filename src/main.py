@@ -1,98 +1,65 @@
-from itertools import chain
+import sys
+from typing import TYPE_CHECKING
 
 import click
 
-from controllers.clinician_controller import ClinicianController
-from db import Database
-from models import AppointmentCategory, AvailabilityResponse, Patient
+from controllers.slot_selection import SlotSelection
+from db import DEFAULT_SNAPSHOT_PATH, Database
+from db.changelog import StaleChangeLogError
+from models.requests import AppointmentCategory
+from output import OutputFormat, TimestampFormat, write_availability
+
+if TYPE_CHECKING:
+    from app import App
 
 DEFAULT_PATIENT_NAME = "Alexander Garcia"
 DEFAULT_APPOINTMENT_TYPE = "ASSESSMENT"
+DEFAULT_SLOT_SELECTION = "GREEDY"
+DEFAULT_OUTPUT_FORMAT = "TEXT"
+DEFAULT_TIMESTAMP_FORMAT = "ISO"
 
 
-class App:
-    def __init__(self):
-        self.db = Database.init()
-        self.clinician_controller = ClinicianController(self.db)
-
-    def get_available_slots(
-        self,
-        patient_id: str,
-        appointment_category: AppointmentCategory,
-    ):
-        """
-        Get all open appointment slots that a Patient can book for a given "type" of appointment
-
-        ASSUMPTION: patient must provide the type of appointment they are looking for when
-                    searching for clinician availability
-        """
-
-        # First, load only clinicians that accept the patient's insurance/state,
-        # and who are the correct "type" to handle this category of appointment
-        patient = Patient.load(self.db, patient_id)
-        compatible_clinians = self.clinician_controller.get_compatible_clinicians(
-            patient, appointment_category
-        )
-        if not compatible_clinians:
-            click.echo(
-                f"No clinicians supporting {appointment_category.value} appointments found in {patient.state.value} that accept {patient.insurance.value}",
-                err=True,
-            )
-            return []
-
-        # Limit each clinician's availability so that
-        # 1. only non-overlapping slots are shown
-        # 2. availability is only shown if the clinician is not already "full" for that day/week
-        duration = 90 if appointment_category == AppointmentCategory.ASSESSMENT else 60
-        for clinician in compatible_clinians:
-            clinician.available_slots = (
-                self.clinician_controller.filter_availability_slots(clinician, duration)
-            )
-
-        # For patients looking to book an initial assessment, they must also book the follow up
-        # assessment at the same time
-        # For each clinician, map from their initial availability to all eligible follow up slots
-        # example:
-        # {
-        #   "clinician-1-id": {"2025-05-04 @ 12:00": ["2025-05-05 @ 12:00", "2025-05-05 @ 13:30"]}
-        #   "clinician-2-id": {"2025-05-04 @ 12:00": ["2025-05-05 @ 12:00", "2025-05-05 @ 13:30"]}
-        # }
-        clinician_follow_up_appointments = {}
-        if appointment_category == AppointmentCategory.ASSESSMENT:
-            for clinician in compatible_clinians:
-                clinician_follow_up_appointments[clinician.id] = (
-                    self.clinician_controller.get_follow_up_appointments(clinician)
-                )
-
-        # Map clinicians with their availability to a user-friendly response model, excluding private clinician information like
-        # maxDailyAppointments/maxWeeklyAppointments
-        clinician_availability = {
-            clinician.id: AvailabilityResponse.from_clinician(
-                clinician,
-                follow_up_slots=clinician_follow_up_appointments.get(clinician.id),
-            )
-            for clinician in compatible_clinians
-        }
-
-        flattened_availability = list(chain(*clinician_availability.values()))
-
-        # Return all clinician availability in chronological order, grouped by clinician
-        return list(
-            sorted(
-                flattened_availability,
-                key=lambda rsp: rsp.sort_fields,
-            )
-        )
+def load_app(ctx: click.Context) -> "App":
+    """
+    Build the App for the current command
+
+    Building the App pulls in pydantic and every model, so it's deferred until a command actually
+    needs it rather than done up front: `--help` and argument errors never pay for it
+    """
+    from app import App
+
+    app = App(**ctx.obj)
+    ctx.call_on_close(app.save_snapshot)
+    return app
 
 
 @click.group()
 @click.pass_context
-def cli(ctx: click.Context):
-    ctx.obj = App()
+@click.option(
+    "--slot-selection",
+    type=click.Choice([selection.name for selection in SlotSelection]),
+    show_choices=True,
+    default=DEFAULT_SLOT_SELECTION,
+    help="Strategy used to pick which of a clinician's available slots are offered",
+)
+@click.option(
+    "--snapshot/--no-snapshot",
+    default=True,
+    help=f"Warm start from (and update) the state snapshot at {DEFAULT_SNAPSHOT_PATH}",
+)
+def cli(
+    ctx: click.Context,
+    slot_selection: str = DEFAULT_SLOT_SELECTION,
+    snapshot: bool = True,
+):
+    ctx.obj = {
+        "slot_selection": SlotSelection[slot_selection],
+        "snapshot_path": DEFAULT_SNAPSHOT_PATH if snapshot else None,
+    }
 
 
 @cli.command()
-@click.pass_obj
+@click.pass_context
 @click.option(
     "--patient-name",
     prompt=True,
@@ -106,10 +73,34 @@ def cli(ctx: click.Context):
     show_choices=True,
     default=DEFAULT_APPOINTMENT_TYPE,
 )
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice([output_format.name for output_format in OutputFormat]),
+    show_choices=True,
+    default=DEFAULT_OUTPUT_FORMAT,
+    help="TEXT for people; JSON or NDJSON for other services",
+)
+@click.option(
+    "--timestamps",
+    type=click.Choice([timestamp_format.name for timestamp_format in TimestampFormat]),
+    show_choices=True,
+    default=DEFAULT_TIMESTAMP_FORMAT,
+    help="How dates are written in JSON/NDJSON output",
+)
+@click.option(
+    "--limit",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Only show this many of the earliest slots",
+)
 def get_open_slots(
-    app: App,
+    ctx: click.Context,
     patient_name: str = DEFAULT_PATIENT_NAME,
     appointment_type: str = DEFAULT_APPOINTMENT_TYPE,
+    output_format: str = DEFAULT_OUTPUT_FORMAT,
+    timestamps: str = DEFAULT_TIMESTAMP_FORMAT,
+    limit: int | None = None,
 ):
     # see ./db/data/patients.json for source
     match patient_name.lower():
@@ -121,25 +112,34 @@ def get_open_slots(
             click.echo(f"Patient {patient_name} not found!", err=True)
             return
 
-    slots = app.get_available_slots(patient_id, AppointmentCategory[appointment_type])
-
-    if not slots:
-        click.echo("No Availability")
-        click.echo("---------------")
-        return
-
-    click.echo("Availability")
-    click.echo("------------")
-    for slot in slots:
-        date_fmt = "%a, %b %d @ %I:%M %p"
-        if slot.follow_up_slot:
-            click.echo(
-                f"({slot.slot.date.strftime(date_fmt)}, {slot.follow_up_slot.date.strftime(date_fmt)}) with {slot.clinician_first_name} {slot.clinician_last_name}"
-            )
-        else:
-            click.echo(
-                f"{slot.slot.date.strftime(date_fmt)} with {slot.clinician_first_name} {slot.clinician_last_name}"
-            )
+    slots = load_app(ctx).get_available_slots(
+        patient_id, AppointmentCategory[appointment_type], limit=limit
+    )
+
+    write_availability(
+        sys.stdout,
+        slots,
+        OutputFormat[output_format],
+        TimestampFormat[timestamps],
+    )
+
+
+@cli.command()
+def compact_changes():
+    """
+    Fold the database's change log into its json files
+    """
+    db = Database.init()
+    try:
+        rejected = db.compact()
+    except StaleChangeLogError as e:
+        raise click.ClickException(f"{e}. Run compact-changes again") from e
+
+    if rejected and db.changelog:
+        click.echo(
+            f"Moved {len(rejected)} change(s) that couldn't be applied to {db.changelog.rejected_path}",
+            err=True,
+        )
 
 
 if __name__ == "__main__":
@@ -1,9 +1,28 @@
-from models.appointment import Appointment, AppointmentStatus, AppointmentType
-from models.clinician import AvailableSlot, Clinician, ClinicianType
-from models.insurance import InsurancePayer
-from models.patient import Patient
-from models.requests import AppointmentCategory
-from models.responses import AvailabilityResponse
+from importlib import import_module
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from models.appointment import Appointment, AppointmentStatus, AppointmentType
+    from models.clinician import AvailableSlot, Clinician, ClinicianType
+    from models.insurance import InsurancePayer
+    from models.patient import Patient
+    from models.requests import AppointmentCategory
+    from models.responses import AvailabilityResponse
+
+# Most models are pydantic models, which are comparatively expensive to import. Map each export
+# to the module defining it, and only import that module once the name is actually used
+_EXPORTS = {
+    "Appointment": "models.appointment",
+    "AppointmentCategory": "models.requests",
+    "AppointmentStatus": "models.appointment",
+    "AppointmentType": "models.appointment",
+    "AvailableSlot": "models.clinician",
+    "AvailabilityResponse": "models.responses",
+    "Clinician": "models.clinician",
+    "ClinicianType": "models.clinician",
+    "InsurancePayer": "models.insurance",
+    "Patient": "models.patient",
+}
 
 __all__ = [
     "Appointment",
@@ -17,3 +36,10 @@ __all__ = [
     "InsurancePayer",
     "Patient",
 ]
+
+
+def __getattr__(name: str):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    return getattr(import_module(_EXPORTS[name]), name)
@@ -29,7 +29,9 @@ class Appointment(BaseModel):
     An Appointment represents a booked meeting between a patient and a clinician
     """
 
-    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+    model_config = ConfigDict(
+        alias_generator=to_camel, populate_by_name=True, defer_build=True
+    )
 
     id: str = Field(default_factory=lambda: str(uuid4()))
     """Unique appointment identifier"""
@@ -17,7 +17,9 @@ class AvailableSlot(BaseModel):
     An AvailableSlot represents an open block of time that a patient can schedule
     """
 
-    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+    model_config = ConfigDict(
+        alias_generator=to_camel, populate_by_name=True, defer_build=True
+    )
 
     id: str = Field(default_factory=lambda: str(uuid4()))
     """Unique slot identifier"""
@@ -56,8 +58,13 @@ class Clinician(BaseModel):
     """
 
     # Make sure we're validating data as we try to updte the clinician's data
+    # Validators are only built on first use (defer_build), so commands that never validate a
+    # clinician, e.g. when restoring from a snapshot, skip building them entirely
     model_config = ConfigDict(
-        validate_assignment=True, alias_generator=to_camel, populate_by_name=True
+        validate_assignment=True,
+        alias_generator=to_camel,
+        populate_by_name=True,
+        defer_build=True,
     )
 
     id: str = Field(default_factory=lambda: str(uuid4()))
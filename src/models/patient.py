@@ -15,7 +15,9 @@ class Patient(BaseModel):
     A Patient represents an end user who can look to schedule appointments with clinicians
     """
 
-    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+    model_config = ConfigDict(
+        alias_generator=to_camel, populate_by_name=True, defer_build=True
+    )
 
     id: str = Field(default_factory=lambda: str(uuid4()))
     """Unique patient identifier"""
@@ -1,7 +1,5 @@
 from enum import Enum
 
-from models.appointment import AppointmentType
-
 
 class AppointmentCategory(Enum):
     ASSESSMENT = "ASSESSMENT"
@@ -9,6 +7,9 @@ class AppointmentCategory(Enum):
 
     @property
     def types(self):
+        # imported here so the CLI can list categories without loading the pydantic models
+        from models.appointment import AppointmentType
+
         match self.name:
             case "ASSESSMENT":
                 return [
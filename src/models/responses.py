@@ -1,6 +1,7 @@
+from collections.abc import Callable, Iterator
 from dataclasses import dataclass
-from itertools import chain
-from typing import Self
+from datetime import datetime
+from typing import Any, Self
 
 from models import AvailableSlot, Clinician
 
@@ -34,15 +35,16 @@ class AvailabilityResponse:
         cls,
         clinician: Clinician,
         follow_up_slots: dict[str, list[AvailableSlot]] | None = None,
-    ) -> list[Self]:
+    ) -> Iterator[Self]:
         """
-        Transform a clinician and their availability into a response model
+        Transform a clinician and their availability into response models, produced lazily in
+        the order of the clinician's available slots
 
         If follow_up_slots is provided, it must be a mapping of
         AvailableSlot id -> all AvailableSlots which can be scheduled for follow up
         """
         if not follow_up_slots:
-            return [
+            return (
                 cls(
                     clinician_first_name=clinician.first_name,
                     clinician_last_name=clinician.last_name,
@@ -50,24 +52,18 @@ class AvailabilityResponse:
                     slot=slot,
                 )
                 for slot in clinician.available_slots
-            ]
+            )
 
-        return list(
-            chain(
-                *[
-                    [
-                        cls(
-                            clinician_first_name=clinician.first_name,
-                            clinician_last_name=clinician.last_name,
-                            clinician_id=clinician.id,
-                            slot=slot,
-                            follow_up_slot=follow_up_slot,
-                        )
-                        for follow_up_slot in follow_up_slots.get(slot.id, [])
-                    ]
-                    for slot in clinician.available_slots
-                ]
+        return (
+            cls(
+                clinician_first_name=clinician.first_name,
+                clinician_last_name=clinician.last_name,
+                clinician_id=clinician.id,
+                slot=slot,
+                follow_up_slot=follow_up_slot,
             )
+            for slot in clinician.available_slots
+            for follow_up_slot in follow_up_slots.get(slot.id, [])
         )
 
     @property
@@ -81,3 +77,22 @@ class AvailabilityResponse:
             self.clinician_first_name,
             self.clinician_id,
         )
+
+    def to_record(self, serialize_date: Callable[[datetime], Any]) -> dict[str, Any]:
+        """
+        Flatten into a json serializable record, using `serialize_date` for every date
+        """
+        follow_up_slot = self.follow_up_slot
+        return {
+            "clinicianId": self.clinician_id,
+            "clinicianFirstName": self.clinician_first_name,
+            "clinicianLastName": self.clinician_last_name,
+            "slotId": self.slot.id,
+            "slotDate": serialize_date(self.slot.date),
+            "slotLength": self.slot.length,
+            "followUpSlotId": follow_up_slot.id if follow_up_slot else None,
+            "followUpSlotDate": (
+                serialize_date(follow_up_slot.date) if follow_up_slot else None
+            ),
+            "followUpSlotLength": follow_up_slot.length if follow_up_slot else None,
+        }
@@ -0,0 +1,125 @@
+import json
+from collections.abc import Callable, Iterable
+from datetime import datetime
+from enum import Enum
+from functools import cache
+from typing import TYPE_CHECKING, TextIO
+
+if TYPE_CHECKING:
+    from models.responses import AvailabilityResponse
+
+TEXT_DATE_FORMAT = "%a, %b %d @ %I:%M %p"
+
+
+class OutputFormat(Enum):
+    """
+    Ways of writing availability out
+    """
+
+    TEXT = "TEXT"
+    """Human readable, one slot per line"""
+
+    JSON = "JSON"
+    """A single json array of records"""
+
+    NDJSON = "NDJSON"
+    """One json record per line"""
+
+
+class TimestampFormat(Enum):
+    """
+    Ways of serializing dates in json output
+    """
+
+    ISO = "ISO"
+    EPOCH = "EPOCH"
+
+    @property
+    def serializer(self) -> Callable[[datetime], str | int]:
+        match self.name:
+            case "ISO":
+                return datetime.isoformat
+            case "EPOCH":
+                return lambda date: int(date.timestamp())
+
+
+def write_availability(
+    stream: TextIO,
+    availability: Iterable["AvailabilityResponse"],
+    output_format: OutputFormat = OutputFormat.TEXT,
+    timestamp_format: TimestampFormat = TimestampFormat.ISO,
+):
+    """
+    Write each availability to `stream` as it is produced
+
+    Lines are written without flushing, leaving it to `stream`'s own buffering (e.g. `sys.stdout`
+    flushes when its buffer fills, or after every line on a terminal), and `stream` is flushed
+    once at the end
+    """
+    # The same slot shows up over and over (paired with each of its follow ups, and for every
+    # clinician), so only serialize each date once
+    match output_format:
+        case OutputFormat.TEXT:
+            _write_text(
+                stream,
+                availability,
+                cache(lambda date: date.strftime(TEXT_DATE_FORMAT)),
+            )
+        case OutputFormat.JSON | OutputFormat.NDJSON:
+            _write_json(
+                stream,
+                availability,
+                cache(timestamp_format.serializer),
+                lines=output_format == OutputFormat.NDJSON,
+            )
+
+    stream.flush()
+
+
+def _write_text(
+    stream: TextIO,
+    availability: Iterable["AvailabilityResponse"],
+    format_date: Callable[[datetime], str],
+):
+    wrote_header = False
+    for rsp in availability:
+        if not wrote_header:
+            stream.write("Availability\n------------\n")
+            wrote_header = True
+
+        clinician_name = f"{rsp.clinician_first_name} {rsp.clinician_last_name}"
+        if rsp.follow_up_slot:
+            stream.write(
+                f"({format_date(rsp.slot.date)}, {format_date(rsp.follow_up_slot.date)}) with {clinician_name}\n"
+            )
+        else:
+            stream.write(f"{format_date(rsp.slot.date)} with {clinician_name}\n")
+
+    if not wrote_header:
+        stream.write("No Availability\n---------------\n")
+
+
+def _write_json(
+    stream: TextIO,
+    availability: Iterable["AvailabilityResponse"],
+    serialize_date: Callable[[datetime], str | int],
+    lines: bool,
+):
+    encode = json.JSONEncoder(separators=(",", ":")).encode
+
+    if lines:
+        for rsp in availability:
+            stream.write(encode(rsp.to_record(serialize_date)))
+            stream.write("\n")
+        return
+
+    separator = "["
+    for rsp in availability:
+        stream.write(separator)
+        stream.write(encode(rsp.to_record(serialize_date)))
+        separator = ",\n"
+
+    # nothing was written: still produce a valid (empty) array
+    if separator == "[":
+        stream.write("[")
+    stream.write("]\n")